@@ -3,12 +3,9 @@
 # Copyright (C) 2024 Apple Inc. All Rights Reserved.
 
 from enum import Enum
-from itertools import chain
 
 import argparse
 import json
-import os
-import requests
 import sys
 
 class Keys(str, Enum):
@@ -21,55 +18,67 @@ class Keys(str, Enum):
     SECONDS_IN_QUEUE = "secondsInQueue"
 
 
-def to_index_request_players_tuple(index, input):
-    """ Return a tuple of the index(0), request (1), and list of player properties (2).
+_RESERVED_KEYS = frozenset(e.value for e in Keys)
+
+
+def to_request_players_tuple(index, input):
+    """ Return a tuple of the request (0), and list of players (1).
     """
 
-    request_input = input[0] if type(input) == list else input
-    input_list = input if type(input) == list else [ input ]
+    is_list = isinstance(input, list)
+    request_input = input[0] if is_list else input
+    input_list = input if is_list else ( input, )
+    request_name = f'r{index}'
+    player_id_prefix = request_name + '_p'
     players_properties = [
         to_player_properties(p)
         for p in input_list
     ]
     players = [
-        to_player(index, i + 1, players_properties[i])
-        for i in range(0, len(players_properties))
+        to_player(request_name, player_id_prefix + str(i), properties)
+        for i, properties in enumerate(players_properties, 1)
     ]
     request = {
-        "requestName": f'r{index}',
-        "playerId": f'r{index}_p1',
+        "requestName": request_name,
+        "playerId": player_id_prefix + '1',
         "properties": players_properties[0],
         "players": players,
-        Keys.APP_VERSION: request_input.get(Keys.APP_VERSION) or "1.0.0",
-        Keys.BUNDLE_ID: request_input.get(Keys.BUNDLE_ID) or "com.example.mygame",
-        Keys.PLATFORM: request_input.get(Keys.PLATFORM) or "IOS",
-        Keys.MIN_PLAYERS: request_input.get(Keys.MIN_PLAYERS) or 2,
-        Keys.MAX_PLAYERS: request_input.get(Keys.MAX_PLAYERS) or 2,
-        Keys.PLAYER_COUNT: len(players),
-        Keys.SECONDS_IN_QUEUE : request_input.get(Keys.SECONDS_IN_QUEUE) or 0
+        "appVersion": get_or_default(request_input, "appVersion", "1.0.0"),
+        "bundleId": get_or_default(request_input, "bundleId", "com.example.mygame"),
+        "platform": get_or_default(request_input, "platform", "IOS"),
+        "minPlayers": get_or_default(request_input, "minPlayers", 2),
+        "maxPlayers": get_or_default(request_input, "maxPlayers", 2),
+        "playerCount": len(players),
+        "secondsInQueue": get_or_default(request_input, "secondsInQueue", 0)
     }
 
     return (
-        index,
         request,
         players
     )
 
-def to_player(request_index, player_index, player_properties):
+def get_or_default(input, key, default):
+    """ Return the value for key, or default if key is missing or null.
+    """
+
+    value = input.get(key)
+    return default if value is None else value
+
+def to_player(request_name, player_id, player_properties):
     """ Return player properties, stripped of request level keys.
     """
     
     return {
-        "playerId": f'r{request_index}_p{player_index}',
+        "playerId": player_id,
         "properties": player_properties,
-        "requestName": f'r{request_index}'
+        "requestName": request_name
     }
 
 def to_player_properties(input):
     """ Return player properties, stripped of request level keys.
     """
     
-    return dict(item for item in input.items() if not item[0] in [e.value for e in Keys])
+    return {k: v for k, v in input.items() if k not in _RESERVED_KEYS}
 
 
 def to_request(request_index):
@@ -78,58 +87,16 @@ def to_request(request_index):
         "id": f'${{r{request_index}}}'
     }
 
-def to_teams(indexRequestPlayers):
-    """ Return teams from list of tuples of index, request, and list of players.
-    """
-    maxPlayers = 2
-    teams = [
-        {
-            "name": "blue",
-            "minPlayers": 2,
-            "maxPlayers": maxPlayers,
-            "players": [
-            ]
-        },
-        {
-            "name": "red",
-            "minPlayers": 2,
-            "maxPlayers": maxPlayers,
-            "players": [
-            ]
-        }
-    ]
-
-    teamIndex = 0
-    
-    for indexRequestPlayer in indexRequestPlayers:
-        request_index = indexRequestPlayer[0]
-        request = indexRequestPlayer[1]
-        players = indexRequestPlayer[2]
-        
-        for player in players:
-            teams[teamIndex]["players"].append(player)
-            teamIndex = (teamIndex + 1) % len(teams)
-            
-    return teams
-
 def verify_input(input):
     assert (type(input) is list), f'Input must be list. Found {type(input)}'
 
     for object in input:
-        match object:
-            case dict():
-                pass
-            case list():
-                verify_input_list_of_object(object)
-            case _:
-                assert False, f'Object must be list of objects or an object. Found {type(object)}'
-    return
-
-def verify_input_list_of_object(input):
-    assert (type(input) is list), f'Input must be list. Found {type(input)}'
-
-    for object in input:
-        assert (type(object) is dict), f'Input must be list of dict. Found {type(object)} in list'
+        object_type = type(object)
+        if object_type is dict:
+            continue
+        assert (object_type is list), f'Object must be list of objects or an object. Found {object_type}'
+        for player in object:
+            assert (type(player) is dict), f'Input must be list of dict. Found {type(player)} in list'
 
 
 def main():
@@ -170,14 +137,33 @@ def main():
     input = json.load(sys.stdin)
     verify_input(input)
 
-    index_input = [(i + 1, input[i]) for i in range(0, len(input))]
-    index_request_players = [
-        to_index_request_players_tuple(t[0], t[1])
-        for t in index_input
+    # Build the requests and the flattened players in a single pass over the input.
+    requests = []
+    players = []
+
+    for i, request_input in enumerate(input, 1):
+        request, request_players = to_request_players_tuple(i, request_input)
+        requests.append(request)
+        players.extend(request_players)
+
+    # Players are distributed alternately between the two teams, so each team is
+    # every other player of the flattened list.
+    maxPlayers = 2
+    teams = [
+        {
+            "name": "blue",
+            "minPlayers": 2,
+            "maxPlayers": maxPlayers,
+            "players": players[0::2]
+        },
+        {
+            "name": "red",
+            "minPlayers": 2,
+            "maxPlayers": maxPlayers,
+            "players": players[1::2]
+        }
     ]
-    requests = [ t[1] for t in index_request_players ]
-    players = [player for t in index_request_players for player in t[2]]
-    teams = to_teams(index_request_players)
+
     output = {
         "requests": requests,
         "players": players,
@@ -189,7 +175,8 @@ def main():
         print(json.dumps(input, indent = 4))
         print("### Output")
     
-    print(json.dumps(output, indent=4))
+    json.dump(output, sys.stdout, indent=4)
+    sys.stdout.write("\n")
 
 if __name__ == '__main__':
     sys.exit(main())
@@ -3,7 +3,9 @@
 # Copyright (C) 2023 Apple Inc. All Rights Reserved.
 
 from enum import Enum
-from itertools import chain
+from functools import lru_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 import argparse
 import json
@@ -21,21 +23,47 @@ class Keys(str, Enum):
     SECOND_IN_QUEUE = "secondsInQueue"
 
 
-def get_request(test_input):
-    """Return test_input if dict, if list then return first object, else raise"""
+_RESERVED_KEYS = frozenset(k.value for k in Keys)
+
+# A shared session pools connections to the API host for callers that invoke main()
+# more than once. The test end point doesn't change any state, so POST is retried on
+# throttling and transient server errors. Once the retries are exhausted the last
+# response is returned so that the API errors are still printed.
+_SESSION = requests.Session()
+_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=8,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.3,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"POST"}),
+            raise_on_status=False,
+        ),
+    ),
+)
+
+# Request attributes, and their defaults, that can be set from the input.
+_REQUEST_DEFAULTS = {
+    "appVersion": "1.0.0",
+    "bundleId": "com.example.mygame",
+    "platform": "IOS",
+    "secondsInQueue": 0,
+}
+
 
-    match test_input:
-        case dict():
-            return test_input
-        case list():
-            return test_input[0]
-        case _:
-            raise Exception(f"Expected dict or list but found {type(test_input)}")
+# typed=True keeps equal values of different types, such as 1 and True, apart. Floats
+# aren't cached as 0.0 and -0.0 are equal and would share an entry.
+@lru_cache(maxsize=4096, typed=True)
+def _dumps_scalar(value):
+    """Return the memoized JSON text for a scalar property value"""
 
+    return json.dumps(value)
 
-def to_gameCenterMatchmakingTestPlayerProperties(
-    request_ordinal, player_ordinal, player_properties
-):
+
+def to_gameCenterMatchmakingTestPlayerProperties(player_id, player_properties):
     """Return a gameCenterMatchmakingTestPlayerProperties dict"""
 
     # An inline test player property object is comprised of an id for the player.
@@ -43,11 +71,15 @@ def to_gameCenterMatchmakingTestPlayerProperties(
     # and "r2_p1", "r2_p2", for the second requests, and so on. This is to allow
     # for a request to include properties for more than one player.
     # See https://developer.apple.com/documentation/appstoreconnectapi/gamecentermatchmakingtestplayerpropertyinlinecreate
-    player_id = f"r{request_ordinal}_p{player_ordinal}"
     properties_list = [
-        {"key": item[0], "value": json.dumps(item[1])}
-        for item in player_properties.items()
-        if item[0] not in [k.value for k in Keys]
+        {
+            "key": k,
+            "value": _dumps_scalar(v)
+            if v is None or isinstance(v, (str, int))
+            else json.dumps(v),
+        }
+        for k, v in player_properties.items()
+        if k not in _RESERVED_KEYS
     ]
 
     return {
@@ -57,81 +89,82 @@ def to_gameCenterMatchmakingTestPlayerProperties(
     }
 
 
-def to_gameCenterMatchmakingTestRequests(
-    request_ordinal, request_dict, player_properties
-):
+def to_gameCenterMatchmakingTestRequests(request_name, request_dict, player_properties):
     """Return a dict for the request"""
 
-    request_name = f"r{request_ordinal}"
+    player_ref_prefix = f"${{{request_name}_p"
     matchmaking_player_properties = [
         {
             "type": "gameCenterMatchmakingTestPlayerProperties",
-            "id": f"${{r{request_ordinal}_p{i + 1}}}",
+            "id": player_ref_prefix + str(i) + "}",
         }
-        for i in range(0, len(player_properties))
+        for i in range(1, len(player_properties) + 1)
     ]
 
-    player_count = len(player_properties)
+    attributes = {
+        "requestName": request_name,
+        **_REQUEST_DEFAULTS,
+        "playerCount": len(player_properties),
+    }
+    for key in _REQUEST_DEFAULTS.keys() & request_dict.keys():
+        attributes[key] = request_dict[key]
+
     request = {
         "type": "gameCenterMatchmakingTestRequests",
         "id": f"${{{request_name}}}",
-        "attributes": {
-            "requestName": request_name,
-            Keys.APP_VERSION: request_dict.get(Keys.APP_VERSION, "1.0.0"),
-            Keys.BUNDLE_ID: request_dict.get(Keys.BUNDLE_ID, "com.example.mygame"),
-            Keys.PLATFORM: request_dict.get(Keys.PLATFORM, "IOS"),
-            "playerCount": player_count,
-            Keys.SECOND_IN_QUEUE: request_dict.get(Keys.SECOND_IN_QUEUE, 0),
-        },
+        "attributes": attributes,
         "relationships": {
             "matchmakingPlayerProperties": {"data": matchmaking_player_properties}
         },
     }
 
-    if request_dict.get(Keys.MIN_PLAYERS):
-        request["attributes"][Keys.MIN_PLAYERS] = request_dict.get(Keys.MIN_PLAYERS)
+    if request_dict.get("minPlayers"):
+        attributes["minPlayers"] = request_dict["minPlayers"]
 
-    if request_dict.get(Keys.MAX_PLAYERS):
-        request["attributes"][Keys.MAX_PLAYERS] = request_dict.get(Keys.MAX_PLAYERS)
+    if request_dict.get("maxPlayers"):
+        attributes["maxPlayers"] = request_dict["maxPlayers"]
 
     return request
 
 
-def to_matchmakingPlayerProperties(request_ordinal, player_properties):
+def to_matchmakingPlayerProperties(request_name, player_properties):
     """Return a list of player props"""
 
+    player_id_prefix = request_name + "_p"
     return [
         to_gameCenterMatchmakingTestPlayerProperties(
-            request_ordinal, i + 1, player_properties[i]
+            player_id_prefix + str(i), properties
         )
-        for i in range(0, len(player_properties))
+        for i, properties in enumerate(player_properties, 1)
     ]
 
 
-def to_matchmakingRequest(request_ordinal):
+def to_matchmakingRequest(request_name):
     # A matchmakingRequest object is comprised of an id for the request unique within
     # the context of the /v1/gameCenterMatchmakingRuleSetTests end point. The request ids
     # are in the sequence of "r1", "r2", "r3", etc.
     # See https://developer.apple.com/documentation/appstoreconnectapi/gamecentermatchmakingtestrequest
     return {
         "type": "gameCenterMatchmakingTestRequests",
-        "id": f"${{r{request_ordinal}}}",
+        "id": f"${{{request_name}}}",
     }
 
 
 def to_matchmaking_request_tuple(request_ordinal, test_input):
     """Return a tuple of the request_ordinal(0), request (1), test requests (2), and list of player properties (3)."""
 
-    request_dict = get_request(test_input)
-    player_props_list = test_input if type(test_input) == list else [test_input]
+    is_list = isinstance(test_input, list)
+    request_dict = test_input[0] if is_list else test_input
+    player_props_list = test_input if is_list else (test_input,)
+    request_name = f"r{request_ordinal}"
 
     return (
         request_ordinal,
-        to_matchmakingRequest(request_ordinal),
+        to_matchmakingRequest(request_name),
         to_gameCenterMatchmakingTestRequests(
-            request_ordinal, request_dict, player_props_list
+            request_name, request_dict, player_props_list
         ),
-        to_matchmakingPlayerProperties(request_ordinal, player_props_list),
+        to_matchmakingPlayerProperties(request_name, player_props_list),
     )
 
 
@@ -140,24 +173,16 @@ def verify_input(test_input):
         raise Exception(f"Input must be list. Found {type(test_input)}")
 
     for object in test_input:
-        match object:
-            case dict():
-                pass
-            case list():
-                verify_input_list_of_object(object)
-            case _:
-                raise Exception(f"Object must be list of objects or an object. Found {type(object)}")
-    return
+        object_type = type(object)
+        if object_type is dict:
+            continue
+        if not object_type is list:
+            raise Exception(f"Object must be list of objects or an object. Found {object_type}")
+        for player in object:
+            if not type(player) is dict:
+                raise Exception(f"Input must be list of dict. Found {type(player)} in list")
 
 
-def verify_input_list_of_object(test_input):
-    if not type(test_input) is list:
-        raise Exception(f"Input must be list. Found {type(test_input)}")
-
-    for object in test_input:
-        if not type(object) is dict:
-            raise Exception(f"Input must be list of dict. Found {type(object)} in list")
-
 def main():
     url = "https://api.appstoreconnect.apple.com/v1/gameCenterMatchmakingRuleSetTests"
 
@@ -220,26 +245,25 @@ def main():
     verify_input(test_input)
 
     matchmaking_request_tuples = [
-        to_matchmaking_request_tuple(i + 1, test_input[i])
-        for i in range(0, len(test_input))
+        to_matchmaking_request_tuple(i, request_input)
+        for i, request_input in enumerate(test_input, 1)
     ]
     matchmaking_requests = [t[1] for t in matchmaking_request_tuples]
-    included_gameCentearMatchmakingTestRequests = [
-        t[2] for t in matchmaking_request_tuples
-    ]
-    included_gameCenterMatchmakingTestPlayerProperties = list(
-        chain.from_iterable([t[3] for t in matchmaking_request_tuples])
-    )
-    included = (
-        included_gameCentearMatchmakingTestRequests
-        + included_gameCenterMatchmakingTestPlayerProperties
-    )
+
+    # The included test requests are followed by the test player properties of all
+    # the requests.
+    included = [t[2] for t in matchmaking_request_tuples]
+    for t in matchmaking_request_tuples:
+        included.extend(t[3])
 
     if args.debug:
         print("### Input")
         print(json.dumps(test_input, indent=4))
 
-    headers = {"Authorization": authentication_token}
+    headers = {
+        "Authorization": authentication_token,
+        "Content-Type": "application/json",
+    }
     content = {
         "data": {
             "type": "gameCenterMatchmakingRuleSetTests",
@@ -259,7 +283,15 @@ def main():
         print("### Content")
         print(json.dumps(content, indent=4))
 
-    response = requests.post(url=url, headers=headers, json=content, verify=True)
+    # Only connecting is timed out; running the rule set test can take a while.
+    try:
+        response = _SESSION.post(
+            url=url, headers=headers, json=content, verify=True, timeout=(5, None)
+        )
+    except requests.exceptions.Timeout as e:
+        print(f"Connection to {url} timed out: {e}", file=sys.stderr)
+        return 1
+
     response_json = response.json()
 
     if args.debug: